@@ -0,0 +1,53 @@
+"""
+Demonstrates GraphOperationGenerator on a graph that contains every kind of node:
+cycles, branches, paths, a self-loop, an isolated node and created nodes.
+
+Run it with `python examples/plan_demo.py` after installing the package.
+"""
+
+from fscode.plan import GraphOperationGenerator
+
+
+def main():
+    all_nodes = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'a1', 'b1', 'c1']
+    edge_list = [
+        ('a', 'b'),
+        ('b', 'c'),
+        ('c1', 'b1'),  # Cycle: c1 -> b1-> a1 -> c1
+        ('b1', 'a1'),
+        ('a1', 'c1'),
+        ('c', 'a'),  # Cycle: a -> b -> c -> a
+        ('c', 'd'),  # Branch
+        ('d', 'd1'),  # Branch
+        ('d', 'e'),  # Path
+        ('f', 'g'),
+        ('g', 'f'),  # Cycle: f -> g -> f
+        ('f', 'h'),  # Branch
+        ('i', 'i'),  # Self-loop (will be classified, but no operation generated)
+        ('', 'x', {'args': ['xxx']}),  # Create
+        ('', 'y'),  # Create
+        # 'j' is an isolated node
+    ]
+
+    # --- Instantiate and generate operations ---
+    op_generator = GraphOperationGenerator(all_nodes, edge_list)
+
+    # 1. Process cycles using a temporary variable (is_exchange=False)
+    print('=' * 40)
+    print('Generated operations (using temporary variable):')
+    print('=' * 40)
+    final_ops_mv = op_generator.generate_operations(is_exchange=False)
+    for op in final_ops_mv:
+        print(op)
+
+    # 2. Process cycles using exchange operation (is_exchange=True)
+    print('\n' + '=' * 40)
+    print('Generated operations (using exchange operation):')
+    print('=' * 40)
+    final_ops_exchange = op_generator.generate_operations(is_exchange=True)
+    for op in final_ops_exchange:
+        print(op)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 
 import os
+import re
 import sys
 import shlex
+from collections.abc import Iterable
 from pathlib import Path
 import tempfile
 from textwrap import dedent
@@ -43,6 +45,45 @@ platform_cmds = {
     },
 }
 
+# Characters that make shlex.split differ from a plain whitespace split: quotes, escapes and comments.
+_SHLEX_SPECIAL_CHARS = re.compile(r'[\'"\\#]')
+# Tokens of a line that contains none of the special characters above.
+_PLAIN_TOKENS = re.compile(r'[^ \t\r\n]+')
+
+
+EDITOR_NOT_FOUND_TEMPLATE = dedent("""\
+    [bold red]Error: Editor command not found: '{editor_cmd}'[/]
+    Please check your command, $VISUAL/$EDITOR, or install a default editor like VS Code.
+    Some common choices: 'code -w', 'msedit', 'micro'""")
+
+TIPS_TEMPLATE = dedent("""\
+    # Lines starting with '#' are ignored.
+    # To delete a file, remove its line or comment it out.
+    # To create a new file, add a new line with ID 0.
+    # To create a new symlink, set the target path in the [args...] position.
+    # Note: You cannot 'modify' a symlink, only create a new one.
+    # To rename/move a file, edit its path.
+    # To swap files, swap their ids.
+    # To copy a file, add a new line with the same ID and a different path.
+    # Set --copy='ln -nT' to use hard links; set --inode to display hard link information.
+    # --- IMPORTANT RULES FOR SPECIAL CHARACTERS ---
+    # If your filename contains characters that need to be escaped in the shell,
+    # please escape them according to the bash's rules (e.g., add quotes).
+
+    # <ID> <Path> {inode_columns}[args...]""")
+
+EDITOR_PROMPT_TEMPLATE = dedent("""\
+    Opening temporary file in editor: [green]{tmp_path}[/]
+    The running command: [green]{edit_cmd}[/]
+    Save and close the editor to continue...
+    """)
+
+SCRIPT_HEADER_TEMPLATE = dedent(f"""\
+    #!/bin/sh
+    # Run this script in the same directory where you ran the original command.
+    # Example: {'source ' if os.name != 'nt' else '.\\'}{{filepath}}
+    """)
+
 
 class FSCode:
     """
@@ -71,12 +112,7 @@ class FSCode:
             return local[cmd_parts[0]][*cmd_parts[1:]]
         except CommandNotFound:
             # If the command does not exist (e.g., 'code' is not installed), catch the exception and provide a friendly hint.
-            prompt_text = f"""
-            [bold red]Error: Editor command not found: '{editor_cmd}'[/]
-            Please check your command, $VISUAL/$EDITOR, or install a default editor like VS Code.
-            Some common choices: 'code -w', 'msedit', 'micro'"""
-            prompt_text = dedent(prompt_text[1:])
-            self._console.print(prompt_text)
+            self._console.print(EDITOR_NOT_FOUND_TEMPLATE.format(editor_cmd=editor_cmd))
             sys.exit(1)
 
     def _generate_temp_file_content(
@@ -88,22 +124,9 @@ class FSCode:
         Generates the content for the temporary TSV file.
         Returns a mapping of ID to original path and the file content string.
         """
-        tips = f"""
-            # Lines starting with '#' are ignored.
-            # To delete a file, remove its line or comment it out.
-            # To create a new file, add a new line with ID 0.
-            # To create a new symlink, set the target path in the [args...] position.
-            # Note: You cannot 'modify' a symlink, only create a new one.
-            # To rename/move a file, edit its path.
-            # To swap files, swap their ids.
-            # To copy a file, add a new line with the same ID and a different path.
-            # Set --copy='ln -nT' to use hard links; set --inode to display hard link information.
-            # --- IMPORTANT RULES FOR SPECIAL CHARACTERS ---
-            # If your filename contains characters that need to be escaped in the shell,
-            # please escape them according to the bash's rules (e.g., add quotes).
-
-            # <ID> <Path> {'<Inode> <Links> ' if show_inode_info else ''}[args...]"""
-        tips = dedent(tips[1:])
+        tips = TIPS_TEMPLATE.format(
+            inode_columns='<Inode> <Links> ' if show_inode_info else ''
+        )
         lines = [tips]
 
         nodes = [''] * (len(file_paths) + 1)
@@ -138,36 +161,45 @@ class FSCode:
         Parses the edited temporary file to extract the desired file operations.
         """
         edges = []
-
-        with temp_file_path.open() as f:
-            # Use enumerate to get line numbers for better error messages
-            for idx, line in enumerate(f, 1):
+        min_len = 4 if has_inode_info else 2
+
+        # Read the whole file at once and split it in C.
+        # Text mode already translates '\r\n', and unlike splitlines() this keeps
+        # characters such as '\x85' that may legitimately appear in file names.
+        lines = temp_file_path.read_text().split('\n')
+        # Use enumerate to get line numbers for better error messages
+        for idx, line in enumerate(lines, 1):
+            # Blank lines and the tips block never need tokenizing.
+            if not line or line[0] == '#':
+                continue
+
+            # Only lines with quotes, escapes or comments need the full shlex state machine.
+            if _SHLEX_SPECIAL_CHARS.search(line):
                 parts = shlex.split(line, comments=True)
-                if not parts:
-                    continue
-
-                min_len = 4 if has_inode_info else 2
-                if len(parts) < min_len:
-                    self._console.print(
-                        f'[bold red]Error:[/] Malformed line {idx}: {line}'
-                    )
-                    sys.exit(1)
-
-                if has_inode_info:
-                    file_id, new_path, inode, links, *args = parts
-                else:
-                    file_id, new_path, *args = parts
+            else:
+                parts = _PLAIN_TOKENS.findall(line)
+            if not parts:
+                continue
+
+            if len(parts) < min_len:
+                self._console.print(f'[bold red]Error:[/] Malformed line {idx}: {line}')
+                sys.exit(1)
+
+            if has_inode_info:
+                file_id, new_path, inode, links, *args = parts
+            else:
+                file_id, new_path, *args = parts
 
-                file_id = int(file_id)
+            file_id = int(file_id)
 
-                if not 0 <= file_id < len(origin_nodes):
-                    self._console.print(
-                        f'[bold red]Error:[/] Invalid ID {file_id} on line {idx}: {line}'
-                    )
-                    sys.exit(1)
+            if not 0 <= file_id < len(origin_nodes):
+                self._console.print(
+                    f'[bold red]Error:[/] Invalid ID {file_id} on line {idx}: {line}'
+                )
+                sys.exit(1)
 
-                original_path = origin_nodes[file_id]
-                edges.append((original_path, new_path, {'args': args}))
+            original_path = origin_nodes[file_id]
+            edges.append((original_path, new_path, {'args': args}))
 
         return edges
 
@@ -177,10 +209,7 @@ class FSCode:
     def run(
         self,
         *paths: str,
-        editor: str = os.getenv('VISUAL')
-        or os.getenv('EDITOR')
-        or platform_cmds['code -w'].get(os.name)
-        or 'code -w',
+        editor: str | None = None,
         output_script=f'file_ops.{"ps1" if os.name == "nt" else "sh"}',
         edit_suffix='.sh',
         null=False,
@@ -227,6 +256,15 @@ class FSCode:
                 When adding a new row, the Inode and Links columns must be set to None.
         :param cmd_prefix: An optional command prefix to prepend to all commands.
         """
+        # Resolve the editor at call time, so environment changes after import are honored.
+        if editor is None:
+            editor = (
+                os.environ.get('VISUAL')
+                or os.environ.get('EDITOR')
+                or platform_cmds['code -w'].get(os.name)
+                or 'code -w'
+            )
+
         # Get input paths
         input_paths = list(paths)
         if not sys.stdin.isatty():
@@ -236,9 +274,12 @@ class FSCode:
                 stdin_paths = [p for p in stdin_content.strip('\0').split('\0') if p]
             else:
                 # We can't use shlex.split here, only line.rstrip, because shlex.split would separate paths with spaces.
-                # We use rstrip instead of strip because we only want to remove trailing \r or \n.
+                # Read everything at once and split it in C; the lines no longer carry their '\n',
+                # and we use rstrip instead of strip because we only want to remove a trailing \r.
                 stdin_paths = [
-                    line.rstrip('\r\n') for line in sys.stdin if line.rstrip('\r\n')
+                    path
+                    for line in sys.stdin.read().split('\n')
+                    if (path := line.rstrip('\r'))
                 ]
 
             input_paths.extend(stdin_paths)
@@ -275,22 +316,19 @@ class FSCode:
             # Create a temporary file that we control
             fd, tmp_path_str = tempfile.mkstemp(suffix=edit_suffix, text=True)
             tmp_path = Path(tmp_path_str)
-            os.close(fd)
 
-            # Write to the file and then close it to ensure the content is flushed to disk.
-            tmp_path.write_text(temp_content)
+            # Write through the descriptor returned by mkstemp instead of reopening the path,
+            # and close it to ensure the content is flushed to disk.
+            with os.fdopen(fd, 'w') as f:
+                f.write(temp_content)
 
             # 2. Open in editor
             editor_cmd = self._get_editor(editor)
             edit_cmd = editor_cmd[tmp_path]
 
-            prompt_text = f"""
-            Opening temporary file in editor: [green]{tmp_path}[/]
-            The running command: [green]{edit_cmd}[/]
-            Save and close the editor to continue...
-            """
-            prompt_text = dedent(prompt_text[1:])
-            self._console.print(prompt_text)
+            self._console.print(
+                EDITOR_PROMPT_TEMPLATE.format(tmp_path=tmp_path, edit_cmd=edit_cmd)
+            )
 
             # This call blocks until the editor is closed
             edit_cmd & FG
@@ -313,7 +351,7 @@ class FSCode:
                 create=create,
                 create_args=create_args,
             )
-            operations = ops_gen.generate_operations(
+            operations = ops_gen.iter_operations(
                 tmp_name=move_tmp_filename or f'./__{generate(size=8)}__.tmp',
                 is_exchange=bool(exchange),
             )
@@ -326,29 +364,23 @@ class FSCode:
             if 'tmp_path' in locals() and tmp_path and tmp_path.exists():
                 tmp_path.unlink()
 
-    def write_script(self, filepath: str | Path, operations: list[list[str]]):
+    def write_script(self, filepath: str | Path, operations: Iterable[list[str]]):
         output_path = Path(filepath)
-        header = f"""
-        #!/bin/sh
-        # Run this script in the same directory where you ran the original command.
-        # Example: {'source ' if os.name != 'nt' else '.\\'}{filepath}
-        """
-        header = dedent(header[1:])
-        script_content = [header]
-        for op in operations:
-            if op[0] == '#':
-                # is a comment
-                # Join the comment parts correctly.
-                comment = ' '.join(op)
-                # Add the comment to the script content.
-                script_content.append(comment)
-            else:
-                # Use shlex to join the command parts correctly.
-                cmdline = shlex.join(op)
-                # Add the command line to the script content.
-                script_content.append(cmdline)
-
-        output_path.write_text('\n'.join(script_content) + '\n')
+        header = SCRIPT_HEADER_TEMPLATE.format(filepath=filepath)
+        # Write each line straight to the file instead of joining the whole script in memory.
+        # A 64 KiB buffer keeps the number of write syscalls low for large scripts.
+        with output_path.open('w', buffering=65536) as f:
+            f.write(header)
+            f.write('\n')
+            for op in operations:
+                if op[0] == '#':
+                    # is a comment
+                    # Join the comment parts correctly.
+                    f.write(' '.join(op))
+                else:
+                    # Use shlex to join the command parts correctly.
+                    f.write(shlex.join(op))
+                f.write('\n')
 
         self._console.print(f'Generated script at [green]{output_path}[/]')
 
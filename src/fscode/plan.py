@@ -1,22 +1,9 @@
 import enum
+from collections import Counter
+from collections.abc import Iterator
+from operator import itemgetter
 from pathlib import Path
 
-import networkx as nx
-from more_itertools import collapse
-
-# [TODO]: A more efficient method is to swap stages two and three, but writing the code by hand is error-prone,
-# so it is not implemented for now.
-# The specific method is as follows:
-# 1. In stage two, build a reverse graph excluding isolated nodes and self-loop nodes,
-#    and perform a topological sort on this graph using Kahn's algorithm.
-#    1. If the algorithm completes successfully, a valid topological sort can be obtained directly,
-#       indicating no cycles exist.
-#    2. If the algorithm finds during execution that there are no longer any nodes with an in-degree of 0
-#       in the in-degree list, then all remaining unprocessed nodes are in cycles.
-# 2. In stage three, remove the previously processed nodes from the forward graph.
-#    Then, traverse the remaining nodes using a DFS algorithm. Each connected component will be a cycle.
-#    Because the in-degree of this graph is <= 1, there are no intersecting cycles.
-
 
 class TokenType(enum.Enum):
     SRC = enum.auto()
@@ -29,6 +16,9 @@ class GraphOperationGenerator:
     Analyzes a special directed graph (all nodes have in-degree <= 1) and directly converts its structure
     into a list of instructions containing abstract 'remove', 'create', 'copy', 'move', and 'exchange' operations.
 
+    Because every node has at most one predecessor, the graph is stored as a plain predecessor map
+    (`pred[v] = u`) plus an out-degree counter, instead of a general-purpose graph object.
+
     Instantiate this class to initialize the graph structure, then call the `generate_operations`
     method to generate the instructions.
     """
@@ -70,113 +60,227 @@ class GraphOperationGenerator:
         self.create_cmd = create
         self.create_args_cmd = create_args
 
-        self.DG = nx.DiGraph()
-        self.DG.add_nodes_from(nodes)
-        self.DG.add_node('')
-        self.DG.add_edges_from(edges)
-
-        self._validate_graph()
+        self.nodes = nodes
+        self._build_graph(edges)
         self._classify_nodes()
 
-    def _validate_graph(self):
-        """Validates if the graph meets the requirement that all nodes have an in-degree <= 1."""
-        for node, in_degree in self.DG.in_degree:
-            if in_degree > 1:
-                msg = f"Input graph does not meet requirements: Node '{node}' has an in-degree of {in_degree}, which exceeds the limit of 1."
-                raise ValueError(msg)
-        if self.DG.in_degree[''] > 0:
-            msg = f"Input graph does not meet requirements: Node '' has an in-degree of {self.DG.in_degree['']}, which exceeds the limit of 0."
-            raise ValueError(msg)
+    def _build_graph(self, edges: list[tuple[str, str]]):
+        """
+        Builds the predecessor map and out-degrees from the edges using C-level
+        dict and Counter construction, then splits off the edges leaving the '' node
+        as created nodes.
+        """
+        # created node -> extra args of its create command
+        self.created_nodes: dict[str, list[str]] = {}
+        if not edges:
+            self.pred: dict[str, str] = {}
+            self.out_degrees: Counter[str] = Counter()
+            return
+
+        # Edges with data are 3-tuples, so only keep the first two columns
+        srcs, dests, *_ = zip(*edges)
+        self.pred = dict(zip(dests, srcs))
+        # Repeated destinations collapse into one key, so a size mismatch means some in-degree > 1
+        if len(self.pred) != len(dests) or '' in self.pred:
+            self._raise_in_degree_error(dests)
+        self.out_degrees = Counter(srcs)
+
+        if self.out_degrees.pop('', 0):
+            for u, v, *data in edges:
+                if u == '':
+                    del self.pred[v]
+                    self.created_nodes[v] = (data[0].get('args') or []) if data else []
+
+    @staticmethod
+    def _raise_in_degree_error(dests: tuple[str, ...]):
+        """Raises the ValueError for the first node that violates the in-degree requirement."""
+        # Stop at the first destination that is '' or already claimed by an earlier edge
+        seen = set()
+        for node in dests:
+            if node == '' or node in seen:
+                break
+            seen.add(node)
+
+        in_degree = dests.count(node)
+        limit = 1 if in_degree > 1 else 0
+        msg = f"Input graph does not meet requirements: Node '{node}' has an in-degree of {in_degree}, which exceeds the limit of {limit}."
+        raise ValueError(msg)
 
     def _classify_nodes(self):
         """Classifies nodes in the graph: created, isolated, self-loop, in-cycle, and normal path."""
-        # Process the creation of nodes first,
-        # and then delete this part from the graph
-        # to prevent interference with subsequent processing.
-        created_nodes = set(self.DG.successors('')) | {''}
-        self.creates_nodes_subgraph = self.DG.subgraph(created_nodes).copy()
-        self.DG.remove_nodes_from(created_nodes)
-
-        self.isolated_nodes = set(nx.isolates(self.DG))
-        self.self_loop_nodes = set(nx.nodes_with_selfloops(self.DG))
-
-        classified_nodes = self.isolated_nodes | self.self_loop_nodes
-
-        cycles_search_subgraph = self.DG.subgraph(
-            set(self.DG.nodes()) - classified_nodes
+        self.self_loop_nodes = set()
+        self.cycles = []
+        self.normal_nodes_set = set()
+        self.sink_nodes = []
+
+        # Isolated nodes are kept in input order and sorted once here:
+        # input paths usually arrive sorted (shell globs, `find | sort`), which timsort
+        # handles in linear time, whereas a hash-ordered set always costs a full sort.
+        # dict.fromkeys drops duplicate input paths while keeping their order.
+        unique_nodes = dict.fromkeys(self.nodes)
+        unique_nodes.pop('', None)
+
+        if not self.pred:
+            # Without edges between nodes, every node is either created or isolated
+            self.isolated_nodes = sorted(
+                node for node in unique_nodes if node not in self.created_nodes
+            )
+            return
+
+        self.isolated_nodes = sorted(
+            node
+            for node in unique_nodes
+            if node not in self.pred
+            and node not in self.out_degrees
+            and node not in self.created_nodes
         )
-        self.cycles = sorted(nx.simple_cycles(cycles_search_subgraph))
-
-        classified_nodes |= set(collapse(self.cycles))
 
-        # After excluding all special nodes, we get the set of normal path nodes
-        self.normal_nodes_set = set(self.DG.nodes()) - classified_nodes
+        if self.pred.keys().isdisjoint(self.out_degrees):
+            # No destination is also a source (plain renames and copies), so there are no cycles:
+            # every destination is a sink, and every source not created here is a root.
+            self.normal_nodes_set.update(self.pred)
+            self.normal_nodes_set.update(
+                self.out_degrees.keys() - self.created_nodes.keys()
+            )
+            self.sink_nodes = sorted(self.pred)
+            return
+
+        # Walk each predecessor chain until it runs out or reaches a node visited by an earlier walk.
+        # Since every node has in-degree <= 1, a walk that runs into itself has found
+        # the only cycle of its component; a cycle of length 1 is a self-loop.
+        # Every other node on the way belongs to a normal path.
+        # Bind the structures used in the hot loop to locals
+        pred, out_degrees = self.pred, self.out_degrees
+        sink_nodes, normal_nodes_set = self.sink_nodes, self.normal_nodes_set
+        visited = set()
+        for start in pred:
+            if start not in out_degrees:
+                # Nothing leaves this node, so it is the sink of a normal path;
+                # path operations are emitted by walking up from these sinks.
+                sink_nodes.append(start)
+            elif start in visited:
+                continue
 
-    def _generate_remove_operations(self) -> list[list[str]]:
+            walk = []
+            pos = {}
+            node = start
+            while node in pred and node not in visited:
+                visited.add(node)
+                pos[node] = len(walk)
+                walk.append(node)
+                node = pred[node]
+
+            if node in pos:
+                # The walk follows edges backwards, so reverse it to get the cycle in edge order.
+                cycle = walk[pos[node] :]
+                cycle.reverse()
+                # Rotate the cycle so it starts at its smallest node, making the output deterministic
+                k = cycle.index(min(cycle))
+                cycle = cycle[k:] + cycle[:k]
+                if len(cycle) == 1:
+                    self.self_loop_nodes.add(node)
+                else:
+                    self.cycles.append(cycle)
+                del walk[pos[node] :]
+            elif node not in pred and node not in self.created_nodes:
+                # The walk ended at the root of a path
+                normal_nodes_set.add(node)
+
+            normal_nodes_set.update(walk)
+        # Cycles are disjoint, so their (unique) first nodes are enough to order them
+        self.cycles.sort(key=itemgetter(0))
+        self.sink_nodes.sort()
+
+    def _generate_remove_operations(self) -> Iterator[list[str]]:
         """Generates operations for isolated nodes -> remove"""
-        return [[*self.remove_cmd, node] for node in sorted(self.isolated_nodes)]
+        remove_cmd = self.remove_cmd
+        for node in self.isolated_nodes:
+            yield [*remove_cmd, node]
 
-    def _generate_create_operations(self) -> list[list[str]]:
+    def _generate_create_operations(self) -> Iterator[list[str]]:
         """Generates operations for created nodes -> create"""
-        operations = []
-        for node in self.creates_nodes_subgraph['']:
-            edge_data = self.creates_nodes_subgraph[''][node]
-            if edge_data.get('args'):
-                operation = [*self.create_args_cmd, *edge_data['args'], node]
+        create_cmd, create_args_cmd = self.create_cmd, self.create_args_cmd
+        for node, args in self.created_nodes.items():
+            if args:
+                yield [*create_args_cmd, *args, node]
             else:
-                operation = [*self.create_cmd, node]
-            operations.append(operation)
-        return operations
+                yield [*create_cmd, node]
 
-    def _generate_path_operations(self) -> list[list[str]]:
+    def _generate_path_operations(self) -> Iterator[list[str]]:
         """Generates operations for normal path nodes -> move or copy"""
-        operations = []
-        normal_nodes_subgraph = self.DG.subgraph(self.normal_nodes_set)
-        reversed_subgraph = normal_nodes_subgraph.reverse(copy=True)
-        reverse_topological_sort = list(nx.topological_sort(reversed_subgraph))
-
-        out_degrees = dict(self.DG.out_degree)
-
-        for dest_node in reverse_topological_sort:
-            predecessors = list(self.DG.predecessors(dest_node))
-            if not predecessors:
-                continue
-
-            src_node = predecessors[0]
-
-            if out_degrees.get(src_node, 0) > 1:
-                operations.append([*self.copy_cmd, src_node, dest_node])
-                out_degrees[src_node] -= 1
-            else:
-                operations.append([*self.move_cmd, src_node, dest_node])
-
-        return operations
+        # Out-edges still pending for the sources that have been copied from;
+        # every other source falls back to its full out-degree.
+        pending_out_degrees = {}
+        copy_cmd, move_cmd = self.copy_cmd, self.move_cmd
+        pred_get, out_degrees = self.pred.get, self.out_degrees
+        normal_nodes_set = self.normal_nodes_set
+
+        # Walking up from the sinks yields a reverse topological order.
+        # A source is only moved away once all of its other out-edges have been copied,
+        # so the walk stops at a source that still has pending out-edges.
+        for dest_node in self.sink_nodes:
+            while (src_node := pred_get(dest_node)) is not None:
+                out_degree = pending_out_degrees.get(src_node) or out_degrees[src_node]
+                if out_degree > 1:
+                    yield [*copy_cmd, src_node, dest_node]
+                    pending_out_degrees[src_node] = out_degree - 1
+                    break
+
+                yield [*move_cmd, src_node, dest_node]
+                if src_node not in normal_nodes_set:
+                    break
+                dest_node = src_node
 
     def _generate_cycle_operations(
         self, is_exchange: bool, tmp_name: str
-    ) -> list[list[str]]:
+    ) -> Iterator[list[str]]:
         """Generates operations for nodes in cycles -> move (using a temporary variable) or exchange"""
         if not self.cycles:
-            return []
+            return
+
+        exchange_cmd, move_cmd = self.exchange_cmd, self.move_cmd
+        # The temporary node is the same for every cycle
+        temp_node = None if is_exchange else str(Path(tmp_name).expanduser())
 
-        operations = [['#', 'Start processing cycles']]
+        yield ['#', 'Start processing cycles']
         for idx, cycle in enumerate(self.cycles, 1):
-            operations.append(['#', f'Processing cycle {idx}:', *cycle])
+            yield ['#', f'Processing cycle {idx}:', *cycle]
 
             if is_exchange:
                 # Use exchange operation, essentially a single-pass bubble sort
                 for i in range(len(cycle) - 2, -1, -1):
-                    operations.append([*self.exchange_cmd, cycle[i], cycle[i + 1]])
+                    yield [*exchange_cmd, cycle[i], cycle[i + 1]]
             else:
                 # Use temporary node
-                temp_node = str(Path(tmp_name).expanduser())
-                operations.append([*self.move_cmd, cycle[-1], temp_node])
+                yield [*move_cmd, cycle[-1], temp_node]
                 for i in range(len(cycle) - 2, -1, -1):
-                    operations.append([*self.move_cmd, cycle[i], cycle[i + 1]])
-                operations.append([*self.move_cmd, temp_node, cycle[0]])
+                    yield [*move_cmd, cycle[i], cycle[i + 1]]
+                yield [*move_cmd, temp_node, cycle[0]]
+
+        yield ['#', f'Total of {len(self.cycles)} cycles']
+
+    def iter_operations(
+        self, *, is_exchange: bool = False, tmp_name: str = '__mv_tmp'
+    ) -> Iterator[list[str]]:
+        """
+        Lazily yields all operation instructions, in the same order as `generate_operations`.
 
-        operations.append(['#', f'Total of {len(self.cycles)} cycles'])
-        return operations
+        Use this to stream the operations (e.g. into a script file) without
+        materializing the whole list.
+
+        Args:
+            is_exchange: Whether to use the exchange operation to handle cycles.
+                    Defaults to False.
+            tmp_name: The temporary name to use when not using the exchange
+                    operation for cycles.
+
+        Yields:
+            One operation instruction at a time.
+        """
+        yield from self._generate_remove_operations()
+        yield from self._generate_path_operations()
+        yield from self._generate_cycle_operations(is_exchange, tmp_name)
+        yield from self._generate_create_operations()
 
     def generate_operations(
         self, *, is_exchange: bool = False, tmp_name: str = '__mv_tmp'
@@ -193,50 +297,4 @@ class GraphOperationGenerator:
         Returns:
             A list containing all operation instructions.
         """
-        return [
-            *self._generate_remove_operations(),
-            *self._generate_path_operations(),
-            *self._generate_cycle_operations(is_exchange, tmp_name),
-            *self._generate_create_operations(),
-        ]
-
-
-if __name__ == '__main__':
-    all_nodes = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'a1', 'b1', 'c1']
-    edge_list = [
-        ('a', 'b'),
-        ('b', 'c'),
-        ('c1', 'b1'),  # Cycle: c1 -> b1-> a1 -> c1
-        ('b1', 'a1'),
-        ('a1', 'c1'),
-        ('c', 'a'),  # Cycle: a -> b -> c -> a
-        ('c', 'd'),  # Branch
-        ('d', 'd1'),  # Branch
-        ('d', 'e'),  # Path
-        ('f', 'g'),
-        ('g', 'f'),  # Cycle: f -> g -> f
-        ('f', 'h'),  # Branch
-        ('i', 'i'),  # Self-loop (will be classified, but no operation generated)
-        ('', 'x', {'args': ['xxx']}),  # Create
-        ('', 'y'),  # Create
-        # 'j' is an isolated node
-    ]
-
-    # --- Instantiate and generate operations ---
-    op_generator = GraphOperationGenerator(all_nodes, edge_list)
-
-    # 1. Process cycles using a temporary variable (is_exchange=False)
-    print('=' * 40)
-    print('Generated operations (using temporary variable):')
-    print('=' * 40)
-    final_ops_mv = op_generator.generate_operations(is_exchange=False)
-    for op in final_ops_mv:
-        print(op)
-
-    # 2. Process cycles using exchange operation (is_exchange=True)
-    print('\n' + '=' * 40)
-    print('Generated operations (using exchange operation):')
-    print('=' * 40)
-    final_ops_exchange = op_generator.generate_operations(is_exchange=True)
-    for op in final_ops_exchange:
-        print(op)
+        return list(self.iter_operations(is_exchange=is_exchange, tmp_name=tmp_name))
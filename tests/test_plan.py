@@ -1,15 +1,18 @@
+import subprocess
+import sys
+from pathlib import Path
+
 import pytest
-import networkx as nx
 
 from src.fscode.plan import GraphOperationGenerator
 
 
-# 1. Core Fixture: Using the comprehensive example from __name__ == '__main__'
+# 1. Core Fixture: Using the comprehensive example from examples/plan_demo.py
 @pytest.fixture
 def main_generator():
     """
     Provides a GraphOperationGenerator instance,
-    based on the example in plan.py's if __name__ == '__main__' block.
+    based on the example in examples/plan_demo.py.
     This example includes all cases:
     - Cycle: a-b-c-a
     - Cycle: f-g-f
@@ -61,29 +64,28 @@ def test_init_validation_fails_empty_node_has_in_degree():
 def test_init_validation_success(main_generator):
     """Test if a valid graph can be instantiated successfully (main_generator runs init)"""
     assert main_generator is not None
-    assert isinstance(main_generator.DG, nx.DiGraph)
+    assert main_generator.pred['b'] == 'a'
+    assert main_generator.out_degrees['c'] == 2
 
 
 # 3. Test node classification logic
 def test_classify_nodes_creates(main_generator):
     """Test classification of "create" nodes"""
     # Check nodes
-    assert set(main_generator.creates_nodes_subgraph.nodes) == {'', 'x', 'y'}
-    # Check edges
-    assert set(main_generator.creates_nodes_subgraph.successors('')) == {'x', 'y'}
+    assert set(main_generator.created_nodes) == {'x', 'y'}
     # Check 'args' for node 'x'
-    assert main_generator.creates_nodes_subgraph['']['x'].get('args') == ['xxx']
+    assert main_generator.created_nodes['x'] == ['xxx']
     # Check that node 'y' has no 'args'
-    assert not main_generator.creates_nodes_subgraph['']['y'].get('args')
-    # Ensure these nodes are removed from the main graph
-    assert '' not in main_generator.DG
-    assert 'x' not in main_generator.DG
-    assert 'y' not in main_generator.DG
+    assert not main_generator.created_nodes['y']
+    # Ensure these nodes are not part of the predecessor map
+    assert '' not in main_generator.pred
+    assert 'x' not in main_generator.pred
+    assert 'y' not in main_generator.pred
 
 
 def test_classify_nodes_isolated(main_generator):
     """Test classification of "isolated" nodes"""
-    assert main_generator.isolated_nodes == {'j'}
+    assert main_generator.isolated_nodes == ['j']
 
 
 def test_classify_nodes_self_loop(main_generator):
@@ -92,10 +94,9 @@ def test_classify_nodes_self_loop(main_generator):
     assert main_generator.self_loop_nodes == {'i'}
 
 
-# May not pass CI, as topological sort is a partial order
 def test_classify_nodes_cycles(main_generator):
     """Test classification of "cycle" nodes (based on sorted results)"""
-    # The output order of networkx.simple_cycles can be non-deterministic, but sorted() in the code guarantees order
+    # Each cycle starts at its smallest node, and cycles are sorted by that node
     assert main_generator.cycles == [['a', 'b', 'c'], ['f', 'g']]
 
 
@@ -104,11 +105,15 @@ def test_classify_nodes_normal_paths(main_generator):
     assert main_generator.normal_nodes_set == {'d', 'd1', 'e', 'h'}
 
 
+def test_classify_nodes_sinks(main_generator):
+    """Test that the sinks of the normal paths are collected in sorted order"""
+    assert main_generator.sink_nodes == ['d1', 'e', 'h']
+
+
 # 4. Test operation generation (integration tests)
-# May not pass CI, as topological sort is a partial order
 def test_generate_operations_main_example_temp_var(main_generator):
     """
-    Test the __main__ example (is_exchange=False, using a temp variable)
+    Test the demo example (is_exchange=False, using a temp variable)
     """
     ops = main_generator.generate_operations(is_exchange=False, tmp_name='__mv_tmp')
 
@@ -118,10 +123,10 @@ def test_generate_operations_main_example_temp_var(main_generator):
 
     expected_other_ops = [
         ['rm', 'j'],  # 1. Remove
-        ['cp', 'd', 'e'],  # 2. Path (e <- d)
-        ['cp', 'f', 'h'],  # 2. Path (h <- f, f has multiple out-edges -> cp)
-        ['mv', 'd', 'd1'],
+        ['cp', 'd', 'd1'],  # 2. Path (d1 <- d, d has multiple out-edges -> cp)
+        ['mv', 'd', 'e'],  # 2. Path (e <- d, last out-edge of d -> mv)
         ['cp', 'c', 'd'],  # 2. Path (d <- c, c has multiple out-edges -> cp)
+        ['cp', 'f', 'h'],  # 2. Path (h <- f, f has multiple out-edges -> cp)
         ['#', 'Start processing cycles'],  # 3. Cycles
         ['#', 'Processing cycle 1:', 'a', 'b', 'c'],
         ['mv', 'c', '__mv_tmp'],
@@ -141,10 +146,9 @@ def test_generate_operations_main_example_temp_var(main_generator):
     assert set(tuple(op) for op in create_ops) == expected_create_ops_set
 
 
-# May not pass CI, as topological sort is a partial order
 def test_generate_operations_main_example_exchange(main_generator):
     """
-    Test the __main__ example (is_exchange=True, using exchange)
+    Test the demo example (is_exchange=True, using exchange)
     """
     ops = main_generator.generate_operations(is_exchange=True)
 
@@ -153,10 +157,10 @@ def test_generate_operations_main_example_exchange(main_generator):
 
     expected_other_ops = [
         ['rm', 'j'],  # 1. Remove
-        ['cp', 'd', 'e'],  # 2. Path
-        ['mv', 'd', 'd1'],
-        ['cp', 'f', 'h'],  # 2. Path (cp)
+        ['cp', 'd', 'd1'],  # 2. Path (cp)
+        ['mv', 'd', 'e'],  # 2. Path
         ['cp', 'c', 'd'],  # 2. Path (cp)
+        ['cp', 'f', 'h'],  # 2. Path (cp)
         ['#', 'Start processing cycles'],  # 3. Cycles
         ['#', 'Processing cycle 1:', 'a', 'b', 'c'],
         ['mv', '--exchange', 'b', 'c'],  # Exchange (i=1)
@@ -172,6 +176,13 @@ def test_generate_operations_main_example_exchange(main_generator):
     assert set(tuple(op) for op in create_ops) == expected_create_ops_set
 
 
+def test_iter_operations_matches_generate_operations(main_generator):
+    """Test that the lazy iterator yields the same operations as the list form"""
+    ops_iter = main_generator.iter_operations(is_exchange=True)
+    assert not isinstance(ops_iter, list)
+    assert list(ops_iter) == main_generator.generate_operations(is_exchange=True)
+
+
 # 5. Test edge cases and specific logic
 def test_generate_ops_empty_graph():
     """Test an empty graph"""
@@ -186,6 +197,12 @@ def test_generate_ops_only_removes():
     assert gen.generate_operations() == [['rm', 'a'], ['rm', 'b'], ['rm', 'c']]
 
 
+def test_generate_ops_removes_unsorted_duplicates():
+    """Test that unsorted, repeated input nodes are removed once each, in sorted order"""
+    gen = GraphOperationGenerator(nodes=['c', 'a', 'b', 'a'], edges=[('b', 'd')])
+    assert gen.generate_operations() == [['rm', 'a'], ['rm', 'c'], ['mv', 'b', 'd']]
+
+
 def test_generate_ops_only_creates():
     """Test with only create nodes"""
     nodes = ['z', 'a']
@@ -198,6 +215,15 @@ def test_generate_ops_only_creates():
     assert set(tuple(op) for op in ops) == expected_ops_set
 
 
+def test_generate_ops_only_creates_and_removes():
+    """Test a graph without edges between nodes, where existing nodes are either created or removed"""
+    nodes = ['a', 'b']
+    edges = [('', 'a')]
+    gen = GraphOperationGenerator(nodes, edges)
+    assert gen.isolated_nodes == ['b']
+    assert gen.generate_operations() == [['rm', 'b'], ['touch', 'a']]
+
+
 def test_generate_ops_only_simple_path():
     """Test a single simple path (a -> b -> c), should generate mv operations"""
     nodes = ['a', 'b', 'c']
@@ -205,8 +231,8 @@ def test_generate_ops_only_simple_path():
     gen = GraphOperationGenerator(nodes, edges)
     ops = gen.generate_operations()
 
-    # Path operations are generated in reverse topological order
-    # Topological sort: 'c', 'b', 'a'
+    # Path operations are generated in reverse topological order,
+    # walking up from the sink 'c'
     # 1. dest='c', src='b' -> ['mv', 'b', 'c']
     # 2. dest='b', src='a' -> ['mv', 'a', 'b']
     assert ops == [['mv', 'b', 'c'], ['mv', 'a', 'b']]
@@ -219,10 +245,9 @@ def test_generate_ops_path_with_copy():
     gen = GraphOperationGenerator(nodes, edges)
     ops = gen.generate_operations()
 
-    # Reverse topological sort could be ['b', 'c', 'a'] or ['c', 'b', 'a']
-    # The result will be:
-    # 1. cp ('a' -> 'b' or 'c')
-    # 2. mv ('a' -> 'c' or 'b')
+    # The sinks 'b' and 'c' are visited in sorted order:
+    # 1. cp ('a' -> 'b')
+    # 2. mv ('a' -> 'c')
 
     assert len(ops) == 2
 
@@ -235,7 +260,23 @@ def test_generate_ops_path_with_copy():
     assert op_contents == [['a', 'b'], ['a', 'c']]
 
 
-# May not pass CI, as topological sort is a partial order
+def test_classify_nodes_renames_only():
+    """Test a graph where no destination is also a source, including a created source"""
+    nodes = ['a', 'b', 'x']
+    edges = [('a', 'a1'), ('b', 'b1'), ('b', 'b2'), ('', 'x'), ('x', 'x1')]
+    gen = GraphOperationGenerator(nodes, edges)
+    assert gen.cycles == []
+    assert gen.normal_nodes_set == {'a', 'a1', 'b', 'b1', 'b2', 'x1'}
+    assert gen.sink_nodes == ['a1', 'b1', 'b2', 'x1']
+    assert gen.generate_operations() == [
+        ['mv', 'a', 'a1'],
+        ['cp', 'b', 'b1'],
+        ['mv', 'b', 'b2'],
+        ['mv', 'x', 'x1'],
+        ['touch', 'x'],
+    ]
+
+
 def test_generate_ops_custom_commands():
     """Test if custom commands from __init__ are used correctly"""
     custom_cmds = {
@@ -281,3 +322,12 @@ def test_generate_ops_custom_commands():
         ('MAKE', 'd'),
     }
     assert ops_mv_set == expected_mv_set
+
+
+# 6. Test import cost
+def test_import_does_not_load_networkx():
+    """Test that importing the planner does not pull in networkx"""
+    code = 'import sys, src.fscode.plan; assert "networkx" not in sys.modules'
+    subprocess.run(
+        [sys.executable, '-c', code], cwd=Path(__file__).parent.parent, check=True
+    )